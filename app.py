@@ -1,4 +1,5 @@
 import streamlit as st
+import math
 import subprocess
 import tempfile
 from pathlib import Path
@@ -41,8 +42,146 @@ def tab_size(value, base):
         return base * 2
     return base
 
+# ---------- CUT PATH ORDERING ----------
+# A cut path is a list of (x, y) points; closed paths repeat the first point at the end.
+def rect_points(x, y, w, h):
+    return [(x, y), (x + w, y), (x + w, y + h), (x, y + h), (x, y)]
+
+def is_closed(points):
+    return len(points) > 2 and points[0] == points[-1]
+
+def _dist(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+def travel_distance(paths, start=(0, 0)):
+    # Pen-up distance: from the start point to each path, then path end to next path start
+    total = 0
+    pos = start
+    for points in paths:
+        total += _dist(pos, points[0])
+        pos = points[-1]
+    return total
+
+def orient_path(points, pos):
+    # Closed loops can start at any vertex, open paths can be cut in either direction
+    if is_closed(points):
+        ring = points[:-1]
+        k = min(range(len(ring)), key=lambda idx: _dist(pos, ring[idx]))
+        ring = ring[k:] + ring[:k]
+        return ring + [ring[0]]
+    if _dist(pos, points[-1]) < _dist(pos, points[0]):
+        return points[::-1]
+    return list(points)
+
+def optimize_cut_order(paths, start=(0, 0), max_passes=50):
+    # --- Nearest neighbour: always cut the path whose entry point is closest ---
+    remaining = list(paths)
+    ordered = []
+    pos = start
+    while remaining:
+        candidates = [orient_path(points, pos) for points in remaining]
+        best = min(range(len(candidates)), key=lambda idx: _dist(pos, candidates[idx][0]))
+        ordered.append(candidates[best])
+        remaining.pop(best)
+        pos = ordered[-1][-1]
+
+    # --- 2-opt: reverse runs of paths while that shortens the travel ---
+    improved = True
+    passes = 0
+    while improved and passes < max_passes:
+        improved = False
+        passes += 1
+        for i in range(len(ordered) - 1):
+            prev_end = ordered[i - 1][-1] if i > 0 else start
+            for j in range(i + 1, len(ordered)):
+                before = _dist(prev_end, ordered[i][0])
+                after = _dist(prev_end, ordered[j][-1])
+                if j + 1 < len(ordered):
+                    next_start = ordered[j + 1][0]
+                    before += _dist(ordered[j][-1], next_start)
+                    after += _dist(ordered[i][0], next_start)
+                if after < before - 1e-9:
+                    ordered[i:j + 1] = [points[::-1] for points in reversed(ordered[i:j + 1])]
+                    improved = True
+
+    return ordered
+
+# ---------- SHARED EDGE MERGING ----------
+def _snap(point):
+    return (round(point[0], 6), round(point[1], 6))
+
+def cut_length(paths):
+    return sum(_dist(a, b) for points in paths for a, b in zip(points, points[1:]))
+
+def merge_shared_edges(paths, tolerance=1e-6):
+    # --- Group segments by the line they lie on (unit direction + offset) ---
+    lines = {}
+    for points in paths:
+        for a, b in zip(points, points[1:]):
+            a, b = _snap(a), _snap(b)
+            if a == b:
+                continue
+            seg_len = _dist(a, b)
+            dx, dy = (b[0] - a[0]) / seg_len, (b[1] - a[1]) / seg_len
+            if dx < 0 or (dx == 0 and dy < 0):
+                dx, dy = -dx, -dy
+            key = (round(dx, 6), round(dy, 6), round(dx * a[1] - dy * a[0], 6))
+            ta = dx * a[0] + dy * a[1]
+            tb = dx * b[0] + dy * b[1]
+            if ta > tb:
+                ta, a, tb, b = tb, b, ta, a
+            lines.setdefault(key, []).append((ta, a, tb, b))
+
+    # --- Merge overlapping / touching spans on each line ---
+    segments = []
+    for spans in lines.values():
+        spans.sort()
+        start_t, start, end_t, end = spans[0]
+        for ta, a, tb, b in spans[1:]:
+            if ta <= end_t + tolerance:
+                if tb > end_t:
+                    end_t, end = tb, b
+            else:
+                segments.append((start, end))
+                start_t, start, end_t, end = ta, a, tb, b
+        segments.append((start, end))
+
+    # --- Chain segments that share endpoints back into polylines ---
+    by_point = {}
+    for idx, (a, b) in enumerate(segments):
+        by_point.setdefault(a, []).append(idx)
+        by_point.setdefault(b, []).append(idx)
+    used = [False] * len(segments)
+
+    def next_point(point):
+        for idx in by_point[point]:
+            if not used[idx]:
+                used[idx] = True
+                a, b = segments[idx]
+                return b if a == point else a
+        return None
+
+    merged = []
+    for idx, (a, b) in enumerate(segments):
+        if used[idx]:
+            continue
+        used[idx] = True
+        points = [a, b]
+        point = next_point(points[-1])
+        while point is not None:
+            points.append(point)
+            point = next_point(points[-1])
+        if not is_closed(points):
+            point = next_point(points[0])
+            while point is not None:
+                points.insert(0, point)
+                point = next_point(points[0])
+        merged.append(points)
+
+    return merged
+
 # ---------- SVG GENERATOR ----------
-def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
+def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100, optimize=True, merge_edges=True):
     def rect(x, y, w, h, stroke="red"):
         return f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="none" stroke="{stroke}" stroke-width="1"/>'
 
@@ -50,6 +189,15 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
         pts_str = " ".join([f"{x},{y}" for x, y in points])
         return f'<polygon points="{pts_str}" fill="none" stroke="{stroke}" stroke-width="1"/>'
 
+    def polyline(points, stroke="red"):
+        pts_str = " ".join([f"{x},{y}" for x, y in points])
+        return f'<polyline points="{pts_str}" fill="none" stroke="{stroke}" stroke-width="1"/>'
+
+    def cut_path(points):
+        if is_closed(points):
+            return polygon(points[:-1])
+        return polyline(points)
+
     def text(x, y, value, size=20, color="red", rotate=0):
         transform = f' transform="rotate({rotate},{x},{y})"' if rotate != 0 else ""
         return f'<text x="{x}" y="{y}" font-size="{size}" fill="{color}" text-anchor="middle" alignment-baseline="middle"{transform}>{value}</text>'
@@ -64,7 +212,7 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
 
     # --- Tab polygons for Bottom-Right L-shape ---
     def tabs_for_bottom_right(base_x, base_y, width, length, ext_w, ext_l, top_tab, bottom_tab, left_tab, right_tab):
-        elements = []
+        paths = []
 
         # Top tab (only main rectangle width)
         top_poly = [
@@ -73,7 +221,7 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
             (base_x + width, base_y),
             (base_x, base_y)
         ]
-        elements.append(polygon(top_poly))
+        paths.append(top_poly + [top_poly[0]])
 
         # Bottom tab (along bottom leg)
         bottom_poly = [
@@ -82,7 +230,7 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
             (base_x + width + ext_w, base_y + length + bottom_tab),
             (base_x, base_y + length + bottom_tab)
         ]
-        elements.append(polygon(bottom_poly))
+        paths.append(bottom_poly + [bottom_poly[0]])
 
         # Left tab
         left_poly = [
@@ -91,7 +239,7 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
             (base_x, base_y + length),
             (base_x - left_tab, base_y + length)
         ]
-        elements.append(polygon(left_poly))
+        paths.append(left_poly + [left_poly[0]])
 
         # Right tab polygon (correct wrapping)
         rt = right_tab
@@ -107,14 +255,15 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
             (base_x + width, base_y + length - ext_l)
             
         ]
-        elements.append(polygon(right_poly))
+        paths.append(right_poly + [right_poly[0]])
 
-        return elements
+        return paths
 
     # --- Layout ---
     max_left_tab = max([tab_size(box.get("left"), box["side"]) for box in boxes] or [0])
     shift_x = max_left_tab + left_margin
     elements = []
+    cut_paths = []
     x_offset = 0
     y_offset = 0
     max_row_height = 0
@@ -153,9 +302,9 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
                 # Draw tabs
                 tabs = tabs_for_bottom_right(base_x, base_y, width, length, ext_w, ext_l,
                                              top_tab, bottom_tab, left_tab, right_tab)
-                elements.extend(tabs)
+                cut_paths.extend(tabs)
             # Draw main polygon
-                elements.append(polygon(main_pts))
+                cut_paths.append(main_pts + [main_pts[0]])
         else:
             main_pts = [
                     (base_x, base_y),
@@ -163,12 +312,12 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
                     (base_x + width, base_y + length),
                     (base_x, base_y + length)
                 ]
-            elements += [
-            rect(base_x, base_y, width, length),
-            rect(base_x, base_y - top_tab, width, top_tab),           # top
-            rect(base_x, base_y + length, width, bottom_tab),         # bottom
-            rect(base_x - left_tab, base_y, left_tab, length),        # left
-            rect(base_x + width, base_y, right_tab, length),          # right
+            cut_paths += [
+            rect_points(base_x, base_y, width, length),
+            rect_points(base_x, base_y - top_tab, width, top_tab),           # top
+            rect_points(base_x, base_y + length, width, bottom_tab),         # bottom
+            rect_points(base_x - left_tab, base_y, left_tab, length),        # left
+            rect_points(base_x + width, base_y, right_tab, length),          # right
             ]
 
         # --- Label inside the box ---
@@ -295,7 +444,17 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
     canvas_width = max(row_widths) + shift_x
     canvas_height = y_offset + max_row_height + spacing*scale
 
-    return f"""
+    # --- Cut path merging + ordering (net geometry first, annotations after) ---
+    stats = {"travel_before": travel_distance(cut_paths), "cut_before": cut_length(cut_paths)}
+    if merge_edges:
+        cut_paths = merge_shared_edges(cut_paths)
+    stats["cut_after"] = cut_length(cut_paths)
+    if optimize:
+        cut_paths = optimize_cut_order(cut_paths)
+    stats["travel_after"] = travel_distance(cut_paths)
+    elements = [cut_path(points) for points in cut_paths] + elements
+
+    svg = f"""
 <svg xmlns="http://www.w3.org/2000/svg"
      width="{canvas_width}mm"
      height="{canvas_height}mm"
@@ -303,6 +462,7 @@ def generate_box_sheet_svg(boxes, spacing=1000, scale=0.1, left_margin=100):
     {''.join(elements)}
 </svg>
 """
+    return svg, stats
 
 
 
@@ -462,9 +622,14 @@ if st.button("🗑️ Clear All Boxes"):
 
 # --- Generate SVG + Preview ---
 if st.session_state.boxes:
-    svg = generate_box_sheet_svg(st.session_state.boxes, scale=0.1, left_margin=30)
+    svg, cut_stats = generate_box_sheet_svg(st.session_state.boxes, scale=0.1, left_margin=30)
 
     st.subheader("Preview")
+    st.caption(
+        f"Estimated pen-up travel: {cut_stats['travel_before']:.0f} mm → "
+        f"{cut_stats['travel_after']:.0f} mm · "
+        f"Cut length: {cut_stats['cut_before']:.0f} mm → {cut_stats['cut_after']:.0f} mm"
+    )
     with tempfile.TemporaryDirectory() as tmp:
         tmp = Path(tmp)
         svg_path = tmp / "preview.svg"